@@ -1,14 +1,45 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Annotated
+from fastapi import Body, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
 from app.stookwijzer.stookwijzerapi import Stookwijzer
-import aiohttp
+import asyncio
+import httpx
 import logging
+import orjson
+import os
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Set up logging, set LOG_LEVEL=DEBUG for verbose output
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
+# httpx logs every request URL (including the RIVM service key) at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
-app = FastAPI(title="Stookwijzer API")
+# Batch limits: maximum locations per request and concurrent lookups per batch
+BATCH_MAX_SIZE = 50
+BATCH_CONCURRENCY = 10
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create a shared HTTP client for the lifetime of the app."""
+    app.state.client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+        timeout=10.0,
+    )
+    try:
+        yield
+    finally:
+        await app.state.client.aclose()
+
+app = FastAPI(
+    title="Stookwijzer API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -23,56 +54,101 @@ app.add_middleware(
 async def root():
     return {"message": "Welcome to Stookwijzer API"}
 
-@app.get("/api/stookwijzer")
-async def get_stookwijzer_data(latitude: float, longitude: float):
+class Coordinates(BaseModel):
+    latitude: float
+    longitude: float
+
+async def fetch_stookwijzer(client: httpx.AsyncClient, latitude: float, longitude: float) -> dict:
+    """Look up the Stookwijzer data for a single location."""
+    logger.debug("Attempting coordinate transformation...")
+    x, y = await Stookwijzer.async_transform_coordinates(latitude, longitude)
+    
+    if x is None or y is None:
+        logger.error("Failed to transform coordinates")
+        raise HTTPException(
+            status_code=400, 
+            detail="Failed to transform coordinates"
+        )
+    
+    logger.debug("Coordinates transformed successfully: x=%s, y=%s", x, y)
+    sw = Stookwijzer(client, x, y)
+    
+    logger.debug("Fetching Stookwijzer data...")
     try:
-        logger.debug(f"Received request for coordinates: lat={latitude}, lon={longitude}")
-        
-        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=False)) as session:
-            logger.debug("Attempting coordinate transformation...")
-            x, y = await Stookwijzer.async_transform_coordinates(session, latitude, longitude)
-            
-            if x is None or y is None:
-                logger.error("Failed to transform coordinates")
-                raise HTTPException(
-                    status_code=400, 
-                    detail="Failed to transform coordinates"
-                )
-            
-            logger.debug(f"Coordinates transformed successfully: x={x}, y={y}")
-            sw = Stookwijzer(session, x, y)
-            
-            logger.debug("Fetching Stookwijzer data...")
-            await sw.async_update()
-            
-            if sw.advice is None:
-                logger.error("No data available for these coordinates")
-                raise HTTPException(
-                    status_code=404, 
-                    detail="No data available for these coordinates"
-                )
-            
-            response_data = {
-                "advice": sw.advice,
-                "alert": sw.alert,
-                "windspeed_bft": sw.windspeed_bft,
-                "windspeed_ms": sw.windspeed_ms,
-                "lki": sw.lki,
-                "forecast_advice": sw.forecast_advice,
-                "forecast_alert": sw.forecast_alert,
-                "last_updated": sw.last_updated.isoformat() if sw.last_updated else None,
-                "coordinates": {
-                    "original": {"latitude": latitude, "longitude": longitude},
-                    "transformed": {"x": x, "y": y}
-                }
+        await sw.async_update()
+    except (httpx.TimeoutException, asyncio.TimeoutError):
+        raise HTTPException(
+            status_code=504,
+            detail="Timed out fetching Stookwijzer data"
+        )
+    except (httpx.HTTPError, orjson.JSONDecodeError):
+        raise HTTPException(
+            status_code=502,
+            detail="Error fetching Stookwijzer data"
+        )
+    
+    if sw.advice is None:
+        logger.error("No data available for these coordinates")
+        raise HTTPException(
+            status_code=404, 
+            detail="No data available for these coordinates"
+        )
+    
+    return {
+        "advice": sw.advice,
+        "alert": sw.alert,
+        "windspeed_bft": sw.windspeed_bft,
+        "windspeed_ms": sw.windspeed_ms,
+        "lki": sw.lki,
+        "forecast_advice": sw.forecast_advice,
+        "forecast_alert": sw.forecast_alert,
+        "last_updated": sw.last_updated_iso,
+        "coordinates": {
+            "original": {"latitude": latitude, "longitude": longitude},
+            "transformed": {"x": x, "y": y}
+        }
+    }
+
+@app.get("/api/stookwijzer")
+async def get_stookwijzer_data(request: Request, latitude: float, longitude: float):
+    logger.debug("Received request for coordinates: lat=%s, lon=%s", latitude, longitude)
+    return await fetch_stookwijzer(request.app.state.client, latitude, longitude)
+
+@app.post("/api/stookwijzer/batch")
+async def get_stookwijzer_batch(
+    request: Request,
+    coordinates: Annotated[list[Coordinates], Body(max_length=BATCH_MAX_SIZE)],
+):
+    """Look up multiple locations concurrently over the shared client."""
+    logger.debug("Received batch request for %s coordinates", len(coordinates))
+    client = request.app.state.client
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def fetch_one(c: Coordinates) -> dict:
+        async with semaphore:
+            return await fetch_stookwijzer(client, c.latitude, c.longitude)
+
+    results = await asyncio.gather(
+        *(fetch_one(c) for c in coordinates),
+        return_exceptions=True,
+    )
+    
+    response_data = []
+    for c, result in zip(coordinates, results):
+        if isinstance(result, Exception):
+            if isinstance(result, HTTPException):
+                status_code, detail = result.status_code, result.detail
+            else:
+                logger.exception("Error in get_stookwijzer_batch", exc_info=result)
+                status_code, detail = 500, "Internal error"
+            result = {
+                "status_code": status_code,
+                "error": detail,
+                "coordinates": {"original": {"latitude": c.latitude, "longitude": c.longitude}},
             }
-            
-            logger.debug(f"Successfully prepared response: {response_data}")
-            return response_data
-            
-    except Exception as e:
-        logger.exception("Error in get_stookwijzer_data")
-        raise HTTPException(status_code=500, detail=str(e))
+        response_data.append(result)
+    
+    return response_data
 
 @app.get("/healthcheck")
 async def healthcheck():
@@ -1,23 +1,140 @@
 """The Stookwijze API."""
-from datetime import datetime, timedelta
-import aiohttp
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
 import asyncio
-import json
+import httpx
 import logging
-import pytz
+import math
+import orjson
+import pyproj
+import time
 
 _LOGGER = logging.getLogger(__name__)
 
+_TIMEZONE = ZoneInfo("Europe/Amsterdam")
+
+# WGS84 (lon/lat) to Rijksdriehoek (EPSG:28992), built once and reused
+_TRANSFORMER = pyproj.Transformer.from_crs(4326, 28992, always_xy=True)
+
+# Timeouts for requests to the RIVM WMS service. httpx applies these per
+# phase (read is per socket read), so the whole fetch is also capped at
+# _WMS_TOTAL_TIMEOUT seconds.
+_WMS_TIMEOUT = httpx.Timeout(10.0, connect=3.0, read=7.0)
+_WMS_TOTAL_TIMEOUT = 10
+
+# Stookwijzer advice codes and their colors
+_COLOR = {"0": "code_yellow", "1": "code_orange", "2": "code_red"}
+
+# Forecast offsets in hours with their advice and alert property names
+_FORECAST_KEYS = tuple(
+    (offset, f"advies_{offset}", f"alert_{offset}") for offset in range(2, 25, 2)
+)
+
+# Grid step in meters; RD coordinates are snapped down to their cell corner
+_GRID_SIZE = 100
+
+# Stookwijzer responses per quantized location: key -> (expiry, data, fetched at)
+_CACHE_TTL = 1800
+_CACHE_MAX_SIZE = 4096
+_CACHE: dict[tuple[float, float], tuple[float, dict, datetime]] = {}
+
+# Fetches in flight per cache key, shared by concurrent lookups of the same cell
+_PENDING: dict[tuple[float, float], asyncio.Task] = {}
+
+
+@lru_cache(maxsize=4096)
+def _transform(latitude: float, longitude: float) -> tuple[float, float]:
+    """Transform WGS84 coordinates to EPSG:28992."""
+    return _TRANSFORMER.transform(longitude, latitude)
+
+
+def _cache_get(key: tuple[float, float]) -> tuple[dict, datetime] | None:
+    """Return a cached Stookwijzer response and its fetch time if it has not expired."""
+    entry = _CACHE.get(key)
+    if entry is None:
+        return None
+    expiry, data, fetched = entry
+    if expiry < time.monotonic():
+        del _CACHE[key]
+        return None
+    return data, fetched
+
+
+def _cache_set(key: tuple[float, float], data: dict) -> datetime:
+    """Store a Stookwijzer response, evicting the oldest entries when full."""
+    now = time.monotonic()
+    if len(_CACHE) >= _CACHE_MAX_SIZE:
+        for k in [k for k, (expiry, _, _) in _CACHE.items() if expiry < now]:
+            del _CACHE[k]
+        while len(_CACHE) >= _CACHE_MAX_SIZE:
+            del _CACHE[next(iter(_CACHE))]
+    fetched = datetime.now()
+    _CACHE[key] = (now + _CACHE_TTL, data, fetched)
+    return fetched
+
+
+def _parse_number(prop: str, value) -> float | None:
+    """Parse a numeric property, returning None when it is missing or invalid."""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        _LOGGER.error(f"Invalid value for property {prop}: {value!r}")
+        return None
+
+
+def _parse_int(prop: str, value) -> int | None:
+    """Parse an integer property, returning None when it is missing or invalid."""
+    number = _parse_number(prop, value)
+    try:
+        return int(number) if number is not None else None
+    except (OverflowError, ValueError):
+        _LOGGER.error(f"Invalid value for property {prop}: {value!r}")
+        return None
+
+
 class Stookwijzer(object):
     """The Stookwijze API."""
 
-    def __init__(self, session: aiohttp.ClientSession, x: float, y: float):
+    _WMS_BASE = "https://data.rivm.nl/geo/alo/wms"
+    _WMS_PARAMS = {
+        "service": "WMS",
+        "VERSION": "1.3.0",
+        "REQUEST": "GetFeatureInfo",
+        "FORMAT": "application/json",
+        "QUERY_LAYERS": "stookwijzer",
+        "LAYERS": "stookwijzer",
+        "servicekey": "82b124ad-834d-4c10-8bd0-ee730d5c1cc8",
+        "STYLES": "",
+        "BUFFER": "1",
+        "info_format": "application/json",
+        "feature_count": "1",
+        "I": "1",
+        "J": "1",
+        "WIDTH": "1",
+        "HEIGHT": "1",
+        "CRS": "EPSG:28992",
+    }
+
+    def __init__(self, client: httpx.AsyncClient, x: float, y: float):
+        x = x // _GRID_SIZE * _GRID_SIZE
+        y = y // _GRID_SIZE * _GRID_SIZE
         self._boundary_box = self.get_boundary_box(x, y)
+        self._cache_key = (x, y)
         self._advice = None
         self._alert = None
         self._last_updated = None
+        self._last_updated_iso = None
+        self._fetched = None
         self._stookwijzer = None
-        self._session = session
+        self._windspeed_bft = None
+        self._windspeed_ms = None
+        self._lki = None
+        self._forecast_advice = None
+        self._forecast_alert = None
+        self._client = client
 
     @property
     def advice(self) -> str | None:
@@ -32,43 +149,46 @@ class Stookwijzer(object):
     @property
     def windspeed_bft(self) -> int | None:
         """Return the windspeed in bft."""
-        return self.get_property("wind_bft")
+        return self._windspeed_bft
 
     @property
     def windspeed_ms(self) -> float | None:
         """Return the windspeed in m/s."""
-        windspeed = self.get_property("wind")
-        return round(float(windspeed), 1) if windspeed else windspeed
+        return self._windspeed_ms
 
     @property
     def lki(self) -> int | None:
         """Return the lki."""
-        return self.get_property("lki")
+        return self._lki
 
     @property
     def forecast_advice(self) -> list:
         """Return the forecast array for advices."""
-        return self.get_forecast_array(True)
+        return self._forecast_advice
 
     @property
     def forecast_alert(self) -> list:
         """Return the forecast array for alerts."""
-        return self.get_forecast_array(False)
+        return self._forecast_alert
 
     @property
     def last_updated(self) -> datetime | None:
         """Get the last updated date."""
         return self._last_updated
 
+    @property
+    def last_updated_iso(self) -> str | None:
+        """Get the last updated date in ISO 8601 format."""
+        return self._last_updated_iso
+
     @staticmethod
-    async def async_transform_coordinates(session: aiohttp.ClientSession, latitude: float, longitude: float):
+    async def async_transform_coordinates(latitude: float, longitude: float):
         """Transform the coordinates from EPSG:4326 to EPSG:28992."""
         try:
-            url = f"https://epsg.io/trans?x={longitude}&y={latitude}&s_srs=4326&t_srs=28992"
-            async with session.get(url=url, timeout=10) as response:
-                text = await response.text()
-                coordinates = json.loads(text)
-                return float(coordinates["x"]), float(coordinates["y"])
+            x, y = _transform(latitude, longitude)
+            if not (math.isfinite(x) and math.isfinite(y)):
+                raise ValueError(f"coordinates out of range: {latitude}, {longitude}")
+            return x, y
         except Exception as e:
             _LOGGER.error(f"Error in coordinate transformation: {str(e)}")
             return None, None
@@ -76,101 +196,87 @@ class Stookwijzer(object):
     async def async_update(self) -> None:
         """Get the stookwijzer data."""
         self._stookwijzer = await self.async_get_stookwijzer()
+        features = (self._stookwijzer or {}).get("features") or [{}]
+        props = features[0].get("properties") or {}
 
-        advice = self.get_property("advies_0")
+        self._windspeed_bft = _parse_int("wind_bft", props.get("wind_bft"))
+        windspeed = _parse_number("wind", props.get("wind"))
+        self._windspeed_ms = round(windspeed, 1) if windspeed is not None else None
+        self._lki = _parse_int("lki", props.get("lki"))
+
+        advice = props.get("advies_0")
         if advice:
             self._advice = self.get_color(advice)
-            self._alert = self.get_property("alert_0") == "1"
-            self._last_updated = datetime.now()
-
-    def get_forecast_array(self, advice: bool) -> list:
-        """Return the forecast array."""
-        forecast = []
-        runtime = self.get_property("model_runtime")
+            self._alert = props.get("alert_0") == "1"
+            self._last_updated = self._fetched
+            self._last_updated_iso = self._fetched.isoformat()
 
-        if not runtime:
-            return None
+        runtime = props.get("model_runtime")
+        if runtime:
+            # The model runtime is reported in Dutch local time
+            localdt = datetime.strptime(runtime, "%d-%m-%Y %H:%M").replace(tzinfo=_TIMEZONE)
+            # Offset in UTC so the steps stay 2 h apart across DST changes
+            base = localdt.astimezone(timezone.utc)
+            self._forecast_advice = []
+            self._forecast_alert = []
+            for offset, advice_key, alert_key in _FORECAST_KEYS:
+                timestamp = (base + timedelta(hours=offset)).astimezone(_TIMEZONE).isoformat()
+                self._forecast_advice.append(
+                    {"datetime": timestamp, "advice": self.get_color(props.get(advice_key))}
+                )
+                self._forecast_alert.append(
+                    {"datetime": timestamp, "alert": props.get(alert_key) == "1"}
+                )
 
-        dt = datetime.strptime(runtime, "%d-%m-%Y %H:%M")
-        localdt = dt.astimezone(pytz.timezone("Europe/Amsterdam"))
+    def get_boundary_box(self, x: float, y: float) -> tuple[float, float, float, float]:
+        """Create a boundary box with the coordinates"""
+        return (x, y, x + 10.0, y + 10.0)
 
-        for offset in range(2, 25, 2):
-            forecast.append(self.get_forecast_at_offset(localdt, offset, advice))
+    @staticmethod
+    def get_color(advice: str) -> str:
+        """Convert the Stookwijzer data into a color."""
+        return _COLOR.get(advice, "")
 
-        return forecast
+    async def async_get_stookwijzer(self):
+        """Get the stookwijzer data, served from the cache when available."""
+        entry = _cache_get(self._cache_key)
+        if entry is not None:
+            data, self._fetched = entry
+            return data
 
-    def get_forecast_at_offset(self, runtime: datetime, offset: int, advice: bool) -> dict:
-        """Get forecast at a certain offset."""
-        dt = {"datetime": (runtime + timedelta(hours=offset)).isoformat()}
-        forecast = (
-            {"advice": self.get_color(self.get_property("advies_" + str(offset)))}
-            if advice
-            else {"alert": self.get_property("alert_" + str(offset)) == "1"}
-        )
-        dt.update(forecast)
-        return dt
+        key = self._cache_key
+        task = _PENDING.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.async_fetch_and_cache_stookwijzer())
+            _PENDING[key] = task
+            task.add_done_callback(lambda _: _PENDING.pop(key, None))
 
-    def get_boundary_box(self, x: float, y: float) -> str | None:
-        """Create a boundary box with the coordinates"""
-        try:
-            # Format coordinates with fixed precision
-            return "{:.6f}%2C{:.6f}%2C{:.6f}%2C{:.6f}".format(
-                float(x),
-                float(y),
-                float(x) + 10.0,
-                float(y) + 10.0
-            )
-        except (ValueError, TypeError) as e:
-            _LOGGER.error(f"Invalid coordinates for boundary box: {str(e)}")
-            return None
+        # Shield the shared fetch so one cancelled caller does not cancel the others
+        data, self._fetched = await asyncio.shield(task)
+        return data
 
-    def get_color(self, advice: str) -> str:
-        """Convert the Stookwijzer data into a color."""
-        if advice == "0":
-            return "code_yellow"
-        if advice == "1":
-            return "code_orange"
-        if advice == "2":
-            return "code_red"
-        return ""
-
-    def get_property(self, prop: str) -> str:
-        """Get a feature from the JSON data"""
-        try:
-            return str(self._stookwijzer["features"][0]["properties"][prop])
-        except (KeyError, IndexError, TypeError):
-            _LOGGER.error(f"Property {prop} not available")
-            return ""
+    async def async_fetch_and_cache_stookwijzer(self) -> tuple[dict, datetime]:
+        """Fetch the stookwijzer data and cache it."""
+        data = await self.async_fetch_stookwijzer()
+        return data, _cache_set(self._cache_key, data)
 
-    async def async_get_stookwijzer(self):
-        """Get the stookwijzer data."""
-        if not self._boundary_box:
-            _LOGGER.error("No boundary box available")
-            return None
-
-        url = (
-            f"https://data.rivm.nl/geo/alo/wms"
-            f"?service=WMS"
-            f"&VERSION=1.3.0"
-            f"&REQUEST=GetFeatureInfo"
-            f"&FORMAT=application%2Fjson"
-            f"&QUERY_LAYERS=stookwijzer"
-            f"&LAYERS=stookwijzer"
-            f"&servicekey=82b124ad-834d-4c10-8bd0-ee730d5c1cc8"
-            f"&STYLES="
-            f"&BUFFER=1"
-            f"&info_format=application%2Fjson"
-            f"&feature_count=1"
-            f"&I=1&J=1"
-            f"&WIDTH=1&HEIGHT=1"
-            f"&CRS=EPSG%3A28992"
-            f"&BBOX={self._boundary_box}"
-        )
+    async def async_fetch_stookwijzer(self):
+        """Fetch the stookwijzer data from RIVM, raising on transport or decode errors."""
+        x1, y1, x2, y2 = self._boundary_box
+        params = {**self._WMS_PARAMS, "BBOX": f"{x1:.6f},{y1:.6f},{x2:.6f},{y2:.6f}"}
 
         try:
-            async with self._session.get(url=url, allow_redirects=False, timeout=10) as response:
-                text = await response.text()
-                return json.loads(text)
-        except Exception as e:
-            _LOGGER.error(f"Error getting Stookwijzer data: {str(e)}")
-            return None
+            response = await asyncio.wait_for(
+                self._client.get(
+                    self._WMS_BASE,
+                    params=params,
+                    follow_redirects=False,
+                    timeout=_WMS_TIMEOUT,
+                ),
+                _WMS_TOTAL_TIMEOUT,
+            )
+            response.raise_for_status()
+            return orjson.loads(response.content)
+        except (httpx.HTTPError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
+            _LOGGER.error(f"Error getting Stookwijzer data: {e!r}")
+            raise
@@ -0,0 +1,29 @@
+import pytest
+
+from app.stookwijzer import stookwijzerapi
+
+
+def make_payload(runtime: str = "24-10-2026 12:00", **overrides) -> dict:
+    """Build a WMS GetFeatureInfo response as returned by RIVM."""
+    properties = {
+        "advies_0": "1",
+        "alert_0": "0",
+        "wind": "3.46",
+        "wind_bft": "3",
+        "lki": "4",
+        "model_runtime": runtime,
+    }
+    for offset in range(2, 25, 2):
+        properties[f"advies_{offset}"] = "2"
+        properties[f"alert_{offset}"] = "1"
+    properties.update(overrides)
+    return {"type": "FeatureCollection", "features": [{"properties": properties}]}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    stookwijzerapi._CACHE.clear()
+    stookwijzerapi._PENDING.clear()
+    yield
+    stookwijzerapi._CACHE.clear()
+    stookwijzerapi._PENDING.clear()
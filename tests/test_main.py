@@ -0,0 +1,119 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import app
+from tests.conftest import make_payload
+
+AMSTERDAM = {"latitude": 52.37, "longitude": 4.90}
+UTRECHT = {"latitude": 52.09, "longitude": 5.12}
+ROTTERDAM = {"latitude": 51.92, "longitude": 4.48}
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    """Serve Utrecht and return no features for everything west of it, such as Amsterdam."""
+    x = float(request.url.params["BBOX"].split(",")[0])
+    if x < 130000:
+        return httpx.Response(200, json={"type": "FeatureCollection", "features": []})
+    return httpx.Response(200, json=make_payload())
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        test_client.portal.call(app.state.client.aclose)
+        app.state.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        yield test_client
+
+
+def test_get_stookwijzer(client):
+    response = client.get("/api/stookwijzer", params=UTRECHT)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["advice"] == "code_orange"
+    assert data["windspeed_bft"] == 3
+    assert len(data["forecast_advice"]) == 12
+    assert data["coordinates"]["original"] == UTRECHT
+
+
+def test_get_stookwijzer_no_data(client):
+    response = client.get("/api/stookwijzer", params=AMSTERDAM)
+    assert response.status_code == 404
+
+
+def test_batch_with_failing_item(client):
+    response = client.post("/api/stookwijzer/batch", json=[UTRECHT, AMSTERDAM, UTRECHT])
+    assert response.status_code == 200
+    first, failed, last = response.json()
+    assert first["advice"] == "code_orange"
+    assert last == first
+    assert failed == {
+        "status_code": 404,
+        "error": "No data available for these coordinates",
+        "coordinates": {"original": AMSTERDAM},
+    }
+
+
+def test_batch_with_unexpected_error(client, monkeypatch):
+    fetch_stookwijzer = main.fetch_stookwijzer
+
+    async def flaky_fetch(http_client, latitude, longitude):
+        if latitude == AMSTERDAM["latitude"]:
+            raise RuntimeError("boom")
+        return await fetch_stookwijzer(http_client, latitude, longitude)
+
+    monkeypatch.setattr(main, "fetch_stookwijzer", flaky_fetch)
+    response = client.post("/api/stookwijzer/batch", json=[UTRECHT, AMSTERDAM])
+    assert response.status_code == 200
+    ok, failed = response.json()
+    assert ok["advice"] == "code_orange"
+    assert failed["status_code"] == 500
+    assert failed["error"] == "Internal error"
+
+
+@pytest.fixture
+def failing_client():
+    """Serve Utrecht and simulate an outage for Amsterdam and a timeout for Rotterdam."""
+    def failing_handler(request: httpx.Request) -> httpx.Response:
+        x = float(request.url.params["BBOX"].split(",")[0])
+        if x < 100000:
+            raise httpx.ReadTimeout("timed out", request=request)
+        if x < 130000:
+            return httpx.Response(503, text="Service Unavailable")
+        return httpx.Response(200, json=make_payload())
+
+    with TestClient(app) as test_client:
+        test_client.portal.call(app.state.client.aclose)
+        app.state.client = httpx.AsyncClient(transport=httpx.MockTransport(failing_handler))
+        yield test_client
+
+
+def test_get_stookwijzer_upstream_error(failing_client):
+    response = failing_client.get("/api/stookwijzer", params=AMSTERDAM)
+    assert response.status_code == 502
+
+
+def test_get_stookwijzer_upstream_timeout(failing_client):
+    response = failing_client.get("/api/stookwijzer", params=ROTTERDAM)
+    assert response.status_code == 504
+
+
+def test_batch_with_upstream_error(failing_client):
+    response = failing_client.post("/api/stookwijzer/batch", json=[UTRECHT, AMSTERDAM, ROTTERDAM])
+    assert response.status_code == 200
+    ok, failed, timed_out = response.json()
+    assert ok["advice"] == "code_orange"
+    assert failed["status_code"] == 502
+    assert timed_out["status_code"] == 504
+
+
+def test_batch_size_limit(client):
+    response = client.post("/api/stookwijzer/batch", json=[UTRECHT] * (main.BATCH_MAX_SIZE + 1))
+    assert response.status_code == 422
+
+
+def test_healthcheck(client):
+    response = client.get("/healthcheck")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
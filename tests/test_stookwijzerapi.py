@@ -0,0 +1,143 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.stookwijzer import stookwijzerapi
+from app.stookwijzer.stookwijzerapi import Stookwijzer
+from tests.conftest import make_payload
+
+
+def mock_client(requests: list, status_code: int = 200, payload: dict | None = None) -> httpx.AsyncClient:
+    """Create a client that records requests and answers with a fixed payload."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(status_code, json=payload if payload is not None else make_payload())
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def update(client: httpx.AsyncClient, x: float, y: float) -> Stookwijzer:
+    sw = Stookwijzer(client, x, y)
+    await sw.async_update()
+    return sw
+
+
+def test_update_parses_properties():
+    requests = []
+
+    async def run():
+        async with mock_client(requests, payload=make_payload(wind_bft=0, lki="2.5")) as client:
+            return await update(client, 136687.5, 455782.6)
+
+    sw = asyncio.run(run())
+    assert sw.advice == "code_orange"
+    assert sw.alert is False
+    assert sw.windspeed_bft == 0
+    assert sw.windspeed_ms == 3.5
+    assert sw.lki == 2
+    assert sw.last_updated_iso is not None
+    assert len(requests) == 1
+
+
+def test_cache_hit_within_cell():
+    requests = []
+
+    async def run():
+        async with mock_client(requests) as client:
+            first = await update(client, 136610.0, 455720.0)
+            second = await update(client, 136690.0, 455790.0)
+            return first, second
+
+    first, second = asyncio.run(run())
+    assert len(requests) == 1
+    assert second.advice == first.advice
+    assert second.last_updated_iso == first.last_updated_iso
+
+
+def test_expired_cache_entry_is_refetched(monkeypatch):
+    monkeypatch.setattr(stookwijzerapi, "_CACHE_TTL", -1)
+    requests = []
+
+    async def run():
+        async with mock_client(requests) as client:
+            await update(client, 136687.5, 455782.6)
+            await update(client, 136687.5, 455782.6)
+
+    asyncio.run(run())
+    assert len(requests) == 2
+
+
+def test_concurrent_lookups_share_one_fetch():
+    requests = []
+
+    async def run():
+        async with mock_client(requests) as client:
+            return await asyncio.gather(*(update(client, 136687.5, 455782.6) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(requests) == 1
+    assert all(sw.advice == "code_orange" for sw in results)
+
+
+def test_error_response_is_not_cached():
+    requests = []
+
+    async def run():
+        async with mock_client(requests, status_code=500, payload={"error": "unavailable"}) as client:
+            for _ in range(2):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await update(client, 136687.5, 455782.6)
+
+    asyncio.run(run())
+    assert len(requests) == 2
+    assert not stookwijzerapi._CACHE
+
+
+def test_snapping_stays_in_cell_near_edge():
+    requests = []
+
+    async def run():
+        async with mock_client(requests) as client:
+            await update(client, 136699.9, 455799.9)
+            await update(client, 136700.0, 455800.0)
+
+    asyncio.run(run())
+    assert [r.url.params["BBOX"] for r in requests] == [
+        "136600.000000,455700.000000,136610.000000,455710.000000",
+        "136700.000000,455800.000000,136710.000000,455810.000000",
+    ]
+
+
+def test_forecast_timestamps_across_dst_change():
+    requests = []
+
+    async def run():
+        async with mock_client(requests, payload=make_payload("24-10-2026 12:00")) as client:
+            return await update(client, 136687.5, 455782.6)
+
+    sw = asyncio.run(run())
+    timestamps = [f["datetime"] for f in sw.forecast_advice]
+    assert timestamps[0] == "2026-10-24T14:00:00+02:00"
+    assert timestamps[6] == "2026-10-25T02:00:00+02:00"
+    assert timestamps[7] == "2026-10-25T03:00:00+01:00"
+    assert timestamps[-1] == "2026-10-25T11:00:00+01:00"
+    assert [f["datetime"] for f in sw.forecast_alert] == timestamps
+    assert sw.forecast_advice[0]["advice"] == "code_red"
+    assert sw.forecast_alert[0]["alert"] is True
+
+
+def test_fetch_is_capped_at_total_timeout(monkeypatch):
+    monkeypatch.setattr(stookwijzerapi, "_WMS_TOTAL_TIMEOUT", 0.01)
+
+    async def slow_handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1)
+        return httpx.Response(200, json=make_payload())
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(slow_handler)) as client:
+            with pytest.raises(asyncio.TimeoutError):
+                await update(client, 136687.5, 455782.6)
+
+    asyncio.run(run())
+    assert not stookwijzerapi._CACHE